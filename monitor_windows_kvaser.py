@@ -9,24 +9,45 @@ Uso no Windows:
 """
 
 import can
+import importlib.util
+import math
 import struct
 import threading
 import time
 import csv
-from collections import deque
-from datetime import datetime
+import queue
 import warnings
 import os
 import argparse
+from functools import partial
+
+import numpy as np
+
+# Numba é opcional: sem ele as funções @njit rodam como Python puro
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 # Configuração do matplotlib para Windows
 warnings.filterwarnings('ignore')
 import matplotlib
-matplotlib.use('TkAgg')  # Backend compatível com Windows
+
+# QtAgg anima bem mais rápido que TkAgg; usa Tk se nenhum binding Qt existir
+if any(importlib.util.find_spec(qt) for qt in ('PyQt6', 'PySide6', 'PyQt5', 'PySide2')):
+    matplotlib.use('QtAgg')
+else:
+    matplotlib.use('TkAgg')  # Backend compatível com Windows
 
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import matplotlib.gridspec as gridspec
+from matplotlib.transforms import Bbox
 
 # Configurar tema dark científico
 plt.style.use('dark_background')
@@ -59,6 +80,115 @@ plt.rcParams['xtick.major.pad'] = 4
 plt.rcParams['ytick.major.pad'] = 4
 
 
+# Layouts pré-compilados dos payloads CAN (little-endian)
+_S_STATUS = struct.Struct('<xHxxH')     # velocidade bytes 1-2, torque bytes 5-6
+_S_SP_TORQUE = struct.Struct('<3xH')    # torque bytes 3-4
+_S_SP_VELOCITY = struct.Struct('<H')    # velocidade bytes 0-1
+
+# Escalas (multiplicação pelo recíproco em vez de divisão)
+_SPEED_OFFSET = 32000
+_TORQUE_SCALE = 1.0 / 526.3157
+_TORQUE_OFFSET = 60.0
+
+# Gravação do CSV: máximo de linhas por lote, linhas em espera na fila (as
+# excedentes são descartadas) e sentinela de parada
+_CSV_BATCH_SIZE = 256
+_CSV_QUEUE_ROWS = 16384
+_CSV_STOP = object()
+
+# Log do setpoint de velocidade: 1 a cada (máscara + 1) frames
+_SP_LOG_MASK = 127
+
+
+# Simulação: passo fixo, frequências (rad/s) e fases dos osciladores senoidais
+_SIM_DT = 0.05  # 20 Hz
+_SIM_FREQS = np.array([0.5, 2.0, 0.3, 1.5, 1.8, 0.35, 1.3])
+_SIM_PHASES = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.3, 0.0])
+_SIM_RESYNC_STEPS = 1000  # recalcula sin/cos exatos para não acumular erro
+_SIM_OSCILLATORS = tuple(zip(_SIM_FREQS.tolist(), _SIM_PHASES.tolist()))
+
+
+@njit(cache=True)
+def _sim_step(sin_s, cos_s, sin_d, cos_d):
+    """Calcula os valores do passo atual e avança os osciladores em _SIM_DT
+    
+    sin_s/cos_s guardam sin/cos da fase de cada oscilador e são atualizados
+    no lugar pela fórmula de adição (rotação), sem chamar sin() por passo.
+    """
+    # Setpoint de velocidade COMPARTILHADO
+    speed_sp = 3000 + 500 * sin_s[0]
+    
+    # Inversor A
+    speed_a = speed_sp + 50 * sin_s[1]
+    torque_sp_a = 30 + 10 * sin_s[2]
+    torque_a = torque_sp_a + 2 * sin_s[3]
+    
+    # Inversor B (com pequena diferença)
+    speed_b = speed_sp + 60 * sin_s[4]
+    torque_sp_b = 35 + 12 * sin_s[5]
+    torque_b = torque_sp_b + 3 * sin_s[6]
+    
+    for i in range(sin_s.shape[0]):
+        s = sin_s[i]
+        c = cos_s[i]
+        sin_s[i] = s * cos_d[i] + c * sin_d[i]
+        cos_s[i] = c * cos_d[i] - s * sin_d[i]
+    
+    return speed_sp, speed_a, torque_sp_a, torque_a, speed_b, torque_sp_b, torque_b
+
+
+def _sim_values(t):
+    """Mesmos valores de _sim_step sem numba: math.sin da fase exata em floats
+    
+    Interpretada, a rotação por índice custa mais que sete chamadas a math.sin.
+    """
+    s0, s1, s2, s3, s4, s5, s6 = [math.sin(w * t + p) for w, p in _SIM_OSCILLATORS]
+    
+    speed_sp = 3000 + 500 * s0
+    speed_a = speed_sp + 50 * s1
+    torque_sp_a = 30 + 10 * s2
+    torque_a = torque_sp_a + 2 * s3
+    speed_b = speed_sp + 60 * s4
+    torque_sp_b = 35 + 12 * s5
+    torque_b = torque_sp_b + 3 * s6
+    
+    return speed_sp, speed_a, torque_sp_a, torque_a, speed_b, torque_sp_b, torque_b
+
+
+def decode_motor_setpoints_torque(data):
+    """Decodifica Motor Setpoints - APENAS TORQUE (bytes 3-4)"""
+    if len(data) < _S_SP_TORQUE.size:
+        return None
+    
+    torque_raw, = _S_SP_TORQUE.unpack_from(data)
+    return {
+        'torque_setpoint': torque_raw * _TORQUE_SCALE - _TORQUE_OFFSET,
+    }
+
+
+def decode_motor_setpoints_velocity(data):
+    """Decodifica Motor Setpoints - VELOCIDADE COMPARTILHADA (bytes 0-1)"""
+    if len(data) < _S_SP_VELOCITY.size:
+        return None
+    
+    speed_raw, = _S_SP_VELOCITY.unpack_from(data)
+    return {
+        'speed_setpoint': speed_raw - _SPEED_OFFSET,
+    }
+
+
+def decode_motor_status(data):
+    """Decodifica Motor Status (velocidade bytes 1-2, torque bytes 5-6)"""
+    if len(data) < _S_STATUS.size:
+        return None
+    
+    speed_raw, torque_raw = _S_STATUS.unpack_from(data)
+    return {
+        'act_speed': speed_raw - _SPEED_OFFSET,
+        'act_torque': torque_raw * _TORQUE_SCALE - _TORQUE_OFFSET,
+    }
+
+
 class CANDecoder:
     """Decodifica mensagens CAN baseado no arquivo de descrição"""
 
@@ -77,54 +207,58 @@ class CANDecoder:
     MSG_INVERTER1_RX = 0x18FFE103
     MSG_INVERTER2_RX = 0x18FFE203
     
-    @staticmethod
-    def decode_speed(data, byte_start):
-        """Decodifica velocidade (int16, offset -32000)"""
-        raw_value = struct.unpack_from('<H', data, byte_start)[0]
-        return raw_value - 32000
-    
-    @staticmethod
-    def decode_speed_set(data, byte_start):
-        """Decodifica velocidade (int16, offset -32000)"""
-        raw_value = struct.unpack_from('<H', data, 0)[0]
-        return raw_value - 32000
-    
-    @staticmethod
-    def decode_torque(data, byte_start):
-        """Decodifica torque (float com multiplicador 526.3157, offset -60)"""
-        raw_value = struct.unpack_from('<H', data, byte_start)[0]
-        return ((raw_value / 526.3157) - 60)
-    
-    @staticmethod
-    def decode_motor_setpoints_torque(data):
-        """Decodifica Motor Setpoints - APENAS TORQUE (bytes 3-4)"""
-        if len(data) < 5:
-            return None
-        
-        return {
-            'torque_setpoint': CANDecoder.decode_torque(data, 3),  # byte 3-4
-        }
-    
-    @staticmethod
-    def decode_motor_setpoints_velocity(data):
-        """Decodifica Motor Setpoints - VELOCIDADE COMPARTILHADA (bytes 0-1)"""
-        if len(data) < 2:
-            return None
-        
-        return {
-            'speed_setpoint': CANDecoder.decode_speed_set(data, 0),  # byte 0-1
-        }
-    
-    @staticmethod
-    def decode_motor_status(data):
-        """Decodifica Motor Status"""
-        if len(data) < 6:
+    # Decodificadores (funções de módulo, expostas também pela classe)
+    decode_motor_setpoints_torque = staticmethod(decode_motor_setpoints_torque)
+    decode_motor_setpoints_velocity = staticmethod(decode_motor_setpoints_velocity)
+    decode_motor_status = staticmethod(decode_motor_status)
+
+
+class _RxReader(can.BufferedReader):
+    """BufferedReader que trata os erros de recepção do Notifier"""
+    
+    def on_error(self, exc):
+        # Tratado aqui, o Notifier registra e segue recebendo em vez de
+        # encerrar a thread no primeiro erro do driver
+        print(f"Erro ao ler mensagem: {exc}")
+        time.sleep(0.01)
+
+
+class RingBuffer:
+    """Buffer circular pré-alocado em NumPy (capacidade em potência de dois)"""
+    
+    def __init__(self, capacity, dtype=np.float32):
+        # Arredonda para potência de dois para indexar com máscara de bits
+        self.capacity = 1 << (max(capacity, 2) - 1).bit_length()
+        self._mask = self.capacity - 1
+        self._buf = np.empty(self.capacity, dtype=dtype)
+        # Buffer "desenrolado" reutilizado a cada quadro quando cheio
+        self._unwrap = np.empty(self.capacity, dtype=dtype)
+        self._head = 0
+        self._count = 0
+    
+    def __len__(self):
+        return self._count
+    
+    def append(self, value):
+        """Adiciona um valor, sobrescrevendo o mais antigo quando cheio"""
+        self._buf[self._head] = value
+        self._head = (self._head + 1) & self._mask
+        if self._count < self.capacity:
+            self._count += 1
+    
+    def last(self):
+        """Retorna o último valor adicionado (ou None se vazio)"""
+        if not self._count:
             return None
-        
-        return {
-            'act_speed': CANDecoder.decode_speed(data, 1),      # byte 1-2 (índice 0-1)
-            'act_torque': CANDecoder.decode_torque(data, 5),    # byte 5-6 (índice 4-5)
-        }
+        return self._buf[(self._head - 1) & self._mask]
+    
+    def view(self):
+        """Retorna os dados em ordem cronológica sem alocar novos arrays"""
+        if self._count < self.capacity:
+            return self._buf[:self._count]
+        head = self._head
+        np.concatenate((self._buf[head:], self._buf[:head]), out=self._unwrap)
+        return self._unwrap
 
 
 class InverterData:
@@ -134,15 +268,19 @@ class InverterData:
         self.name = name
         self.buffer_size = buffer_size
         
-        # Buffers de dados
-        self.timestamps = deque(maxlen=buffer_size)
-        self.act_speed = deque(maxlen=buffer_size)
-        self.speed_setpoint = deque(maxlen=buffer_size)
-        self.act_torque = deque(maxlen=buffer_size)
-        self.torque_setpoint = deque(maxlen=buffer_size)
+        # Buffers de dados (timestamps em float64 para comparação exata)
+        self.timestamps = RingBuffer(buffer_size, dtype=np.float64)
+        self.act_speed = RingBuffer(buffer_size)
+        self.speed_setpoint = RingBuffer(buffer_size)
+        self.act_torque = RingBuffer(buffer_size)
+        self.torque_setpoint = RingBuffer(buffer_size)
         
         self.msg_count = 0
         
+        # Contador de sequência (seqlock): ímpar durante uma escrita. Há um
+        # único escritor por inversor; o leitor refaz a cópia se ele mudar
+        self.seq = 0
+        
         # Armazenar último setpoint de velocidade recebido
         self.last_speed_setpoint = None
     
@@ -152,52 +290,89 @@ class InverterData:
     
     def add_torque_setpoint_data(self, timestamp, torque_sp):
         """Adiciona dados de setpoint de torque"""
+        self.seq += 1
         self.timestamps.append(timestamp)
         self.torque_setpoint.append(torque_sp)
         # Usar último setpoint de velocidade conhecido
         if self.last_speed_setpoint is not None:
             self.speed_setpoint.append(self.last_speed_setpoint)
+        self.seq += 1
     
     def add_status_data(self, timestamp, speed_act, torque_act):
         """Adiciona dados de status"""
-        if not self.timestamps or self.timestamps[-1] != timestamp:
+        self.seq += 1
+        if self.timestamps.last() != timestamp:
             self.timestamps.append(timestamp)
         self.act_speed.append(speed_act)
         self.act_torque.append(torque_act)
+        self.seq += 1
+    
+    def add_status_and_sp(self, timestamp, speed_act, torque_act, torque_sp):
+        """Adiciona status e setpoints de um mesmo instante numa única escrita"""
+        self.seq += 1
+        self.timestamps.append(timestamp)
+        self.act_speed.append(speed_act)
+        self.act_torque.append(torque_act)
+        self.torque_setpoint.append(torque_sp)
+        if self.last_speed_setpoint is not None:
+            self.speed_setpoint.append(self.last_speed_setpoint)
+        self.seq += 1
     
     def get_latest_values(self):
         """Retorna os últimos valores disponíveis"""
         return {
-            'speed_act': self.act_speed[-1] if self.act_speed else None,
-            'speed_sp': self.speed_setpoint[-1] if self.speed_setpoint else None,
-            'torque_act': self.act_torque[-1] if self.act_torque else None,
-            'torque_sp': self.torque_setpoint[-1] if self.torque_setpoint else None,
+            'speed_act': self.act_speed.last(),
+            'speed_sp': self.speed_setpoint.last(),
+            'torque_act': self.act_torque.last(),
+            'torque_sp': self.torque_setpoint.last(),
         }
 
 
 class WindowsKvaserMonitor:
     """Monitor de dois inversores CAN para Windows com driver Kvaser"""
     
-    def __init__(self, channel=0, buffer_size=500, csv_output=None):
+    def __init__(self, channel=0, buffer_size=500, csv_output=None,
+                 speed_range=None, torque_range=None):
         self.channel = channel
         self.buffer_size = buffer_size
         self.running = False
         self.csv_output = csv_output
         
-        # Lock para sincronização thread-safe
-        self.data_lock = threading.Lock()
+        # Faixas fixas do eixo Y (min, max); None = autoescala
+        self.speed_range = speed_range
+        self.torque_range = torque_range
         
         # Dados dos dois inversores
         self.inverter_a = InverterData("Inversor A", buffer_size)
         self.inverter_b = InverterData("Inversor B", buffer_size)
         
+        # Tabela de despacho: arbitration_id -> handler(data, timestamp)
+        self._dispatch = {
+            CANDecoder.MSG_MOTOR_SETPOINTS_AB_VEL: self._handle_speed_setpoint,
+            CANDecoder.MSG_MOTOR_SETPOINTS_A: partial(self._handle_torque_setpoint, self.inverter_a),
+            CANDecoder.MSG_MOTOR_STATUS_A: partial(self._handle_status, self.inverter_a),
+            CANDecoder.MSG_MOTOR_SETPOINTS_B: partial(self._handle_torque_setpoint, self.inverter_b),
+            CANDecoder.MSG_MOTOR_STATUS_B: partial(self._handle_status, self.inverter_b),
+        }
+        
         # CSV logging
         self.csv_file = None
         self.csv_writer = None
+        self._csv_queue = None
+        self._csv_thread = None
+        self._csv_dropped = 0
+        self._csv_second = None
+        self._csv_second_str = ''
         if self.csv_output:
             self._init_csv_file()
         
+        # Recepção CAN (criados em read_can_messages)
+        self._reader = None
+        self._notifier = None
+        self._ts_offset = None
+        
         # Estatísticas
+        self._sp_log_counter = 0
         self.total_msg_count = 0
         self.start_time = None
     
@@ -223,45 +398,87 @@ class WindowsKvaserMonitor:
             self.csv_writer.writerow(header)
             self.csv_file.flush()
             print(f"✓ Arquivo CSV criado: {self.csv_output}")
+            
+            # Linhas são gravadas em lotes por uma thread dedicada
+            self._csv_queue = queue.Queue(maxsize=_CSV_QUEUE_ROWS)
+            self._csv_thread = threading.Thread(target=self._csv_writer_loop, daemon=True)
+            self._csv_thread.start()
         except Exception as e:
             print(f"✗ Erro ao criar arquivo CSV: {e}")
             self.csv_file = None
             self.csv_writer = None
     
     def _write_to_csv(self, timestamp):
-        """Escreve uma linha no arquivo CSV com dados de ambos inversores"""
-        if not self.csv_writer:
+        """Enfileira uma linha do CSV com dados de ambos inversores"""
+        if not self._csv_queue:
             return
         
+        # Apenas captura os valores; a formatação fica na thread de escrita.
+        # Fila cheia (escrita atrasada): descarta a linha em vez de bloquear
         try:
-            dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-            
-            # Pegar dados dos inversores
-            data_a = self.inverter_a.get_latest_values()
-            data_b = self.inverter_b.get_latest_values()
-            
-            # Escrever linha
-            row = [
-                f"{timestamp:.3f}",
-                dt,
-                f"{data_a['speed_act']:.2f}" if data_a['speed_act'] is not None else "",
-                f"{data_a['speed_sp']:.2f}" if data_a['speed_sp'] is not None else "",
-                f"{data_a['torque_act']:.2f}" if data_a['torque_act'] is not None else "",
-                f"{data_a['torque_sp']:.2f}" if data_a['torque_sp'] is not None else "",
-                f"{data_b['speed_act']:.2f}" if data_b['speed_act'] is not None else "",
-                f"{b['speed_sp']:.2f}" if (data_b['speed_sp'] is not None) else "",
-                f"{data_b['torque_act']:.2f}" if data_b['torque_act'] is not None else "",
-                f"{data_b['torque_sp']:.2f}" if data_b['torque_sp'] is not None else "",
-            ]
-            
-            self.csv_writer.writerow(row)
-            
-            # Flush periodicamente
-            if self.total_msg_count % 10 == 0:
-                self.csv_file.flush()
+            self._csv_queue.put_nowait((
+                timestamp,
+                self.inverter_a.get_latest_values(),
+                self.inverter_b.get_latest_values(),
+            ))
+        except queue.Full:
+            self._csv_dropped += 1
+    
+    def _format_csv_row(self, item):
+        """Converte uma linha enfileirada em campos de texto do CSV"""
+        timestamp, data_a, data_b = item
+        
+        # Data/hora derivada do timestamp; strftime só roda quando o segundo muda
+        wall_time = self.start_time + timestamp
+        second = int(wall_time)
+        if second != self._csv_second:
+            self._csv_second = second
+            self._csv_second_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+        dt = f"{self._csv_second_str}.{int((wall_time - second) * 1000):03d}"
+        
+        return [
+            f"{timestamp:.3f}",
+            dt,
+            f"{data_a['speed_act']:.2f}" if data_a['speed_act'] is not None else "",
+            f"{data_a['speed_sp']:.2f}" if data_a['speed_sp'] is not None else "",
+            f"{data_a['torque_act']:.2f}" if data_a['torque_act'] is not None else "",
+            f"{data_a['torque_sp']:.2f}" if data_a['torque_sp'] is not None else "",
+            f"{data_b['speed_act']:.2f}" if data_b['speed_act'] is not None else "",
+            f"{data_b['speed_sp']:.2f}" if data_b['speed_sp'] is not None else "",
+            f"{data_b['torque_act']:.2f}" if data_b['torque_act'] is not None else "",
+            f"{data_b['torque_sp']:.2f}" if data_b['torque_sp'] is not None else "",
+        ]
+    
+    def _csv_writer_loop(self):
+        """Thread que drena a fila e grava o CSV em lotes (um flush por lote)"""
+        get = self._csv_queue.get
+        get_nowait = self._csv_queue.get_nowait
+        
+        while True:
+            item = get()
+            rows = []
+            try:
+                while item is not _CSV_STOP:
+                    rows.append(self._format_csv_row(item))
+                    if len(rows) >= _CSV_BATCH_SIZE:
+                        break
+                    try:
+                        item = get_nowait()
+                    except queue.Empty:
+                        break
                 
-        except Exception as e:
-            print(f"Erro ao escrever no CSV: {e}")
+                if rows:
+                    self.csv_writer.writerows(rows)
+                    self.csv_file.flush()
+            except Exception as e:
+                # Falha de I/O ou de formatação: desabilita o logging em vez de
+                # repetir o erro por linha (e de a fila crescer sem a thread)
+                print(f"✗ Erro ao escrever no CSV, logging desabilitado: {e}")
+                self._csv_queue = None
+                return
+            
+            if item is _CSV_STOP:
+                return
     
     def start_can_listener(self):
         """Inicia listener do barramento CAN Kvaser"""
@@ -278,12 +495,20 @@ class WindowsKvaserMonitor:
         """Thread para ler mensagens CAN"""
         print("Iniciando leitura de mensagens CAN...")
         self.start_time = time.time()
+        self._ts_offset = None
+        
+        # O Notifier recebe do barramento em sua própria thread e enfileira no
+        # BufferedReader; aqui o acúmulo é drenado em lote sem esperar
+        self._reader = _RxReader()
+        self._notifier = can.Notifier(self.bus, [self._reader], timeout=0.1)
+        get_message = self._reader.get_message
         
         while self.running:
             try:
-                msg = self.bus.recv(timeout=0.1)
-                if msg:
+                msg = get_message(timeout=0.1)
+                while msg is not None:
                     self.process_message(msg)
+                    msg = get_message(timeout=0.0)
             except Exception as e:
                 print(f"Erro ao ler mensagem: {e}")
                 time.sleep(0.01)
@@ -291,111 +516,108 @@ class WindowsKvaserMonitor:
     def process_message(self, msg):
         """Processa mensagem CAN recebida"""
         self.total_msg_count += 1
-        timestamp = time.time() - self.start_time
-        
-        with self.data_lock:
-            # Processar setpoint de velocidade compartilhado
-            if msg.arbitration_id == CANDecoder.MSG_MOTOR_SETPOINTS_AB_VEL:
-                decoded = CANDecoder.decode_motor_setpoints_velocity(msg.data)
-                if decoded:
-                    # Atualizar setpoint de velocidade para AMBOS inversores
-                    self.inverter_a.update_speed_setpoint(decoded['speed_setpoint'])
-                    self.inverter_b.update_speed_setpoint(decoded['speed_setpoint'])
-                    print(f"Setpoint velocidade: {decoded['speed_setpoint']:.0f} rpm")
-            
-            # Processar mensagens do Inversor A
-            elif msg.arbitration_id == CANDecoder.MSG_MOTOR_SETPOINTS_A:
-                decoded = CANDecoder.decode_motor_setpoints_torque(msg.data)
-                if decoded:
-                    self.inverter_a.add_torque_setpoint_data(
-                        timestamp,
-                        decoded['torque_setpoint']
-                    )
-                    self.inverter_a.msg_count += 1
-                    
-            elif msg.arbitration_id == CANDecoder.MSG_MOTOR_STATUS_A:
-                decoded = CANDecoder.decode_motor_status(msg.data)
-                if decoded:
-                    self.inverter_a.add_status_data(
-                        timestamp,
-                        decoded['act_speed'],
-                        decoded['act_torque']
-                    )
-                    self.inverter_a.msg_count += 1
-            
-            # Processar mensagens do Inversor B
-            elif msg.arbitration_id == CANDecoder.MSG_MOTOR_SETPOINTS_B:
-                decoded = CANDecoder.decode_motor_setpoints_torque(msg.data)
-                if decoded:
-                    self.inverter_b.add_torque_setpoint_data(
-                        timestamp,
-                        decoded['torque_setpoint']
-                    )
-                    self.inverter_b.msg_count += 1
-                    
-            elif msg.arbitration_id == CANDecoder.MSG_MOTOR_STATUS_B:
-                decoded = CANDecoder.decode_motor_status(msg.data)
-                if decoded:
-                    self.inverter_b.add_status_data(
-                        timestamp,
-                        decoded['act_speed'],
-                        decoded['act_torque']
-                    )
-                    self.inverter_b.msg_count += 1
+        
+        # Usa o timestamp de hardware do driver, alinhado ao start_time no
+        # primeiro frame; time.time() só quando o frame não traz timestamp
+        hw_timestamp = msg.timestamp
+        if hw_timestamp:
+            if self._ts_offset is None:
+                self._ts_offset = hw_timestamp - (time.time() - self.start_time)
+            timestamp = hw_timestamp - self._ts_offset
+        else:
+            timestamp = time.time() - self.start_time
+        
+        # Sem lock: InverterData sinaliza as escritas pelo contador seq
+        handler = self._dispatch.get(msg.arbitration_id)
+        if handler:
+            handler(msg.data, timestamp)
         
         # Salvar em CSV se habilitado
         if self.csv_output:
             self._write_to_csv(timestamp)
     
+    def _handle_speed_setpoint(self, data, timestamp):
+        """Setpoint de velocidade compartilhado: atualiza AMBOS inversores"""
+        decoded = decode_motor_setpoints_velocity(data)
+        if decoded:
+            # Atribuição simples (atômica)
+            self.inverter_a.update_speed_setpoint(decoded['speed_setpoint'])
+            self.inverter_b.update_speed_setpoint(decoded['speed_setpoint'])
+            
+            # Log limitado: imprime o primeiro e depois 1 a cada 128 frames
+            if (self._sp_log_counter & _SP_LOG_MASK) == 0:
+                print(f"Setpoint velocidade: {decoded['speed_setpoint']:.0f} rpm")
+            self._sp_log_counter += 1
+    
+    def _handle_torque_setpoint(self, inverter, data, timestamp):
+        """Setpoint de torque de um inversor"""
+        decoded = decode_motor_setpoints_torque(data)
+        if decoded:
+            inverter.add_torque_setpoint_data(timestamp, decoded['torque_setpoint'])
+            inverter.msg_count += 1
+    
+    def _handle_status(self, inverter, data, timestamp):
+        """Status (velocidade e torque atuais) de um inversor"""
+        decoded = decode_motor_status(data)
+        if decoded:
+            inverter.add_status_data(timestamp, decoded['act_speed'], decoded['act_torque'])
+            inverter.msg_count += 1
+    
     def simulate_can_data(self):
         """Simula dados CAN para teste"""
-        try:
-            import numpy as np
-        except ImportError:
-            print("✗ numpy não está instalado. Instale com: pip install numpy")
-            return
-            
         print("Modo simulação ativado - gerando dados de teste")
         self.start_time = time.time()
         
+        # Incremento de fase constante por passo
+        sin_d = np.sin(_SIM_FREQS * _SIM_DT)
+        cos_d = np.cos(_SIM_FREQS * _SIM_DT)
+        step = 0
+        resync = True
+        
         while self.running:
-            timestamp = time.time() - self.start_time
+            timestamp = step * _SIM_DT
+            if not _HAVE_NUMBA:
+                values = _sim_values(timestamp)
+            else:
+                if resync or step % _SIM_RESYNC_STEPS == 0:
+                    resync = False
+                    phase = _SIM_FREQS * timestamp + _SIM_PHASES
+                    sin_s = np.sin(phase)
+                    cos_s = np.cos(phase)
+                values = _sim_step(sin_s, cos_s, sin_d, cos_d)
             
-            # Simular setpoint de velocidade COMPARTILHADO
-            speed_sp_shared = 3000 + 500 * np.sin(timestamp * 0.5)
+            (speed_sp_shared,
+             speed_act_a, torque_sp_a, torque_act_a,
+             speed_act_b, torque_sp_b, torque_act_b) = values
             
             # Atualizar setpoint de velocidade para ambos
-            with self.data_lock:
-                self.inverter_a.update_speed_setpoint(speed_sp_shared)
-                self.inverter_b.update_speed_setpoint(speed_sp_shared)
+            self.inverter_a.update_speed_setpoint(speed_sp_shared)
+            self.inverter_b.update_speed_setpoint(speed_sp_shared)
             
-            # Simular dados do Inversor A
-            speed_act_a = speed_sp_shared + 50 * np.sin(timestamp * 2)
-            torque_sp_a = 30 + 10 * np.sin(timestamp * 0.3)
-            torque_act_a = torque_sp_a + 2 * np.sin(timestamp * 1.5)
+            # Adicionar dados do Inversor A
+            self.inverter_a.add_status_and_sp(timestamp, speed_act_a, torque_act_a, torque_sp_a)
+            self.inverter_a.msg_count += 2
             
-            # Simular dados do Inversor B (com pequena diferença)
-            speed_act_b = speed_sp_shared + 60 * np.sin(timestamp * 1.8)
-            torque_sp_b = 35 + 12 * np.sin(timestamp * 0.35 + 0.3)
-            torque_act_b = torque_sp_b + 3 * np.sin(timestamp * 1.3)
-            
-            with self.data_lock:
-                # Adicionar dados do Inversor A
-                self.inverter_a.add_torque_setpoint_data(timestamp, torque_sp_a)
-                self.inverter_a.add_status_data(timestamp, speed_act_a, torque_act_a)
-                self.inverter_a.msg_count += 2
-                
-                # Adicionar dados do Inversor B
-                self.inverter_b.add_torque_setpoint_data(timestamp, torque_sp_b)
-                self.inverter_b.add_status_data(timestamp, speed_act_b, torque_act_b)
-                self.inverter_b.msg_count += 2
+            # Adicionar dados do Inversor B
+            self.inverter_b.add_status_and_sp(timestamp, speed_act_b, torque_act_b, torque_sp_b)
+            self.inverter_b.msg_count += 2
             
             # Salvar em CSV se habilitado
             if self.csv_output:
                 self._write_to_csv(timestamp)
             
             self.total_msg_count += 4
-            time.sleep(0.05)  # 20 Hz
+            
+            # Aguarda o instante do próximo passo (sem acumular atraso)
+            step += 1
+            delay = self.start_time + step * _SIM_DT - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -_SIM_DT:
+                # Após um travamento, salta para o instante atual em vez de gerar
+                # de uma vez todos os passos atrasados (fases recalculadas)
+                step = int((time.time() - self.start_time) / _SIM_DT)
+                resync = True
     
     def setup_plots(self):
         """Configura os gráficos para dois inversores"""
@@ -455,87 +677,163 @@ class WindowsKvaserMonitor:
         
         plt.suptitle('Monitor Windows - Dois Inversores CAN (Kvaser)', 
                     fontsize=14, fontweight='bold', y=0.998, color='#c9d1d9')
-    
-    def update_plot(self, frame):
-        """Atualiza os gráficos (chamado pela animação)"""
-        with self.data_lock:
-            # Copiar dados thread-safe
-            inv_a = self.inverter_a
-            inv_b = self.inverter_b
+        
+        # Linhas redesenhadas por blitting a cada quadro; o restante da figura
+        # (eixos, ticks, estatísticas) só é redesenhado no caminho lento
+        self._animated_artists = (
+            self.line_speed_act_a, self.line_speed_sp_a,
+            self.line_torque_act_a, self.line_torque_sp_a,
+            self.line_speed_act_b, self.line_speed_sp_b,
+            self.line_torque_act_b, self.line_torque_sp_b,
+        )
+        for artist in self._animated_artists:
+            artist.set_animated(True)
+        
+        # Estatísticas: fora do blit da animação (artista de figura, sem
+        # Axes), redesenhadas no próprio ritmo por _blit_stats
+        self.stats_text.set_animated(True)
+        self._stats_bg = None
+        self._stats_extent = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self._frame_count = 0
+        self._xlim_max = 0.0
+        
+        # Eixos com faixa fixa não precisam de relim()/autoscale_view()
+        self._autoscale_axes = []
+        for axes, y_range in ((self.ax_speed_a, self.speed_range),
+                              (self.ax_speed_b, self.speed_range),
+                              (self.ax_torque_a, self.torque_range),
+                              (self.ax_torque_b, self.torque_range)):
+            if y_range:
+                axes.set_ylim(*y_range)
+            else:
+                self._autoscale_axes.append(axes)
+    
+    def _update_inverter_lines(self, inv, line_speed_act, line_speed_sp,
+                               line_torque_act, line_torque_sp):
+        """Copia os dados de um inversor para as linhas (leitura seqlock)"""
+        while True:
+            seq = inv.seq
+            if seq & 1:
+                # Escrita em andamento: cede a vez para o escritor terminar
+                time.sleep(0)
+                continue
             
-            if len(inv_a.timestamps) < 2 and len(inv_b.timestamps) < 2:
-                return
+            t = inv.timestamps.view()
+            speed_act = inv.act_speed.view()
+            speed_sp = inv.speed_setpoint.view()
+            torque_act = inv.act_torque.view()
+            torque_sp = inv.torque_setpoint.view()
+            
+            # set_data copia os arrays, então a cópia fica dentro da janela
+            if len(speed_act) > 0:
+                line_speed_act.set_data(t[-len(speed_act):], speed_act)
+            if len(speed_sp) > 0:
+                line_speed_sp.set_data(t[-len(speed_sp):], speed_sp)
             
-            # Dados do Inversor A
-            t_a = list(inv_a.timestamps)
-            speed_act_a = list(inv_a.act_speed)
-            speed_sp_a = list(inv_a.speed_setpoint)
-            torque_act_a = list(inv_a.act_torque)
-            torque_sp_a = list(inv_a.torque_setpoint)
+            if len(torque_act) > 0:
+                line_torque_act.set_data(t[-len(torque_act):], torque_act)
+            if len(torque_sp) > 0:
+                line_torque_sp.set_data(t[-len(torque_sp):], torque_sp)
             
-            # Dados do Inversor B
-            t_b = list(inv_b.timestamps)
-            speed_act_b = list(inv_b.act_speed)
-            speed_sp_b = list(inv_b.speed_setpoint)
-            torque_act_b = list(inv_b.act_torque)
-            torque_sp_b = list(inv_b.torque_setpoint)
+            last_time = t[-1] if len(t) else 0
+            last_speed = speed_act[-1] if len(speed_act) else None
+            last_torque = torque_act[-1] if len(torque_act) else None
+            
+            if inv.seq == seq:
+                return last_time, last_speed, last_torque
+    
+    def update_plot(self, frame):
+        """Atualiza os gráficos (chamado pela animação)"""
+        inv_a = self.inverter_a
+        inv_b = self.inverter_b
         
-        # ===== Atualizar gráficos do Inversor A =====
-        if len(speed_act_a) > 0:
-            self.line_speed_act_a.set_data(t_a[-len(speed_act_a):], speed_act_a)
-        if len(speed_sp_a) > 0:
-            self.line_speed_sp_a.set_data(t_a[-len(speed_sp_a):], speed_sp_a)
+        if len(inv_a.timestamps) < 2 and len(inv_b.timestamps) < 2:
+            return self._animated_artists
         
-        if len(torque_act_a) > 0:
-            self.line_torque_act_a.set_data(t_a[-len(torque_act_a):], torque_act_a)
-        if len(torque_sp_a) > 0:
-            self.line_torque_sp_a.set_data(t_a[-len(torque_sp_a):], torque_sp_a)
+        # ===== Atualizar gráficos do Inversor A =====
+        last_time_a, last_speed_a, last_torque_a = self._update_inverter_lines(
+            inv_a, self.line_speed_act_a, self.line_speed_sp_a,
+            self.line_torque_act_a, self.line_torque_sp_a)
         
         # ===== Atualizar gráficos do Inversor B =====
-        if len(speed_act_b) > 0:
-            self.line_speed_act_b.set_data(t_b[-len(speed_act_b):], speed_act_b)
-        if len(speed_sp_b) > 0:
-            self.line_speed_sp_b.set_data(t_b[-len(speed_sp_b):], speed_sp_b)
-        
-        if len(torque_act_b) > 0:
-            self.line_torque_act_b.set_data(t_b[-len(torque_act_b):], torque_act_b)
-        if len(torque_sp_b) > 0:
-            self.line_torque_sp_b.set_data(t_b[-len(torque_sp_b):], torque_sp_b)
+        last_time_b, last_speed_b, last_torque_b = self._update_inverter_lines(
+            inv_b, self.line_speed_act_b, self.line_speed_sp_b,
+            self.line_torque_act_b, self.line_torque_sp_b)
         
-        # Ajustar limites dos eixos X (janela de 10 segundos)
-        max_time = max(t_a[-1] if t_a else 0, t_b[-1] if t_b else 0)
-        window = 10
-        
-        for ax in [self.ax_speed_a, self.ax_torque_a, self.ax_speed_b, self.ax_torque_b]:
-            ax.set_xlim(max(0, max_time - window), max_time + 1)
+        max_time = max(last_time_a, last_time_b)
         
-        # Ajustar limites dos eixos Y
-        for ax in [self.ax_speed_a, self.ax_torque_a, self.ax_speed_b, self.ax_torque_b]:
-            ax.relim()
-            ax.autoscale_view()
+        # Mudar os limites dos eixos invalida o fundo do blit: limites só a
+        # cada 10 quadros ou quando o tempo sai do xlim; estatísticas a cada 4
+        self._frame_count += 1
+        full_redraw = self._frame_count % 10 == 0 or max_time > self._xlim_max
+        if not full_redraw and self._frame_count % 4:
+            return self._animated_artists
         
         # Atualizar estatísticas
         elapsed_time = max_time
         msg_rate = self.total_msg_count / elapsed_time if elapsed_time > 0 else 0
         
-        stats_str = f"Tempo: {elapsed_time:.1f}s | Msgs: {self.total_msg_count} | Taxa: {msg_rate:.1f} msg/s\n"
-        stats_str += f"Inversor A: {inv_a.msg_count} msgs"
-        if len(speed_act_a) > 0:
-            stats_str += f" | Vel: {speed_act_a[-1]:.0f} rpm"
-        if len(torque_act_a) > 0:
-            stats_str += f" | Torque: {torque_act_a[-1]:.1f} N/m"
+        stats = [f"Tempo: {elapsed_time:.1f}s | Msgs: {self.total_msg_count} | Taxa: {msg_rate:.1f} msg/s",
+                 "\nInversor A: ", str(inv_a.msg_count), " msgs"]
+        if last_speed_a is not None:
+            stats.append(f" | Vel: {last_speed_a:.0f} rpm")
+        if last_torque_a is not None:
+            stats.append(f" | Torque: {last_torque_a:.1f} N/m")
         
-        stats_str += f"\nInversor B: {inv_b.msg_count} msgs"
-        if len(speed_act_b) > 0:
-            stats_str += f" | Vel: {speed_act_b[-1]:.0f} rpm"
-        if len(torque_act_b) > 0:
-            stats_str += f" | Torque: {torque_act_b[-1]:.1f} N/m"
+        stats += ["\nInversor B: ", str(inv_b.msg_count), " msgs"]
+        if last_speed_b is not None:
+            stats.append(f" | Vel: {last_speed_b:.0f} rpm")
+        if last_torque_b is not None:
+            stats.append(f" | Torque: {last_torque_b:.1f} N/m")
         
         # Mostrar setpoint de velocidade compartilhado
         if inv_a.last_speed_setpoint is not None:
-            stats_str += f"\nVel Setpoint Compartilhado: {inv_a.last_speed_setpoint:.0f} rpm"
+            stats.append(f"\nVel Setpoint Compartilhado: {inv_a.last_speed_setpoint:.0f} rpm")
         
-        self.stats_text.set_text(stats_str)
+        self.stats_text.set_text(''.join(stats))
+        
+        if not full_redraw:
+            self._blit_stats()
+            return self._animated_artists
+        
+        # Ajustar limites dos eixos X (janela de 10 segundos)
+        window = 10
+        self._xlim_max = max_time + 1
+        
+        for ax in [self.ax_speed_a, self.ax_torque_a, self.ax_speed_b, self.ax_torque_b]:
+            ax.set_xlim(max(0, max_time - window), self._xlim_max)
+        
+        # Ajustar limites dos eixos Y (apenas eixos sem faixa fixa)
+        for ax in self._autoscale_axes:
+            ax.relim()
+            ax.autoscale_view()
+        
+        # Redesenho completo (sem as linhas animadas); a animação recaptura
+        # o fundo dos eixos cuja vista mudou antes de desenhar as linhas
+        self.fig.canvas.draw()
+        return self._animated_artists
+    
+    def _on_draw(self, event):
+        """Após um redesenho completo: guarda o fundo e desenha as estatísticas"""
+        self._stats_bg = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.fig.draw_artist(self.stats_text)
+        self._stats_extent = self.stats_text.get_bbox_patch().get_window_extent()
+    
+    def _blit_stats(self):
+        """Redesenha só o texto de estatísticas sobre o fundo guardado"""
+        if self._stats_bg is None:
+            return
+        canvas = self.fig.canvas
+        # Restaura só a área do texto anterior: o resto do buffer mantém as
+        # linhas animadas já desenhadas e não há cópia da figura inteira
+        dirty = Bbox.intersection(self._stats_extent.padded(2), self.fig.bbox)
+        if dirty is not None:
+            canvas.restore_region(self._stats_bg, bbox=dirty)
+        self.fig.draw_artist(self.stats_text)
+        extent = self.stats_text.get_bbox_patch().get_window_extent()
+        canvas.blit(Bbox.union([self._stats_extent, extent]).padded(2))
+        self._stats_extent = extent
     
     def run(self, simulation_mode=False):
         """Executa o monitor"""
@@ -565,7 +863,7 @@ class WindowsKvaserMonitor:
         print("🛑 Feche a janela ou pressione Ctrl+C para parar\n")
         
         # Armazenar animação para evitar garbage collection
-        self.anim = FuncAnimation(self.fig, self.update_plot, interval=50, blit=False)
+        self.anim = FuncAnimation(self.fig, self.update_plot, interval=50, blit=True)
         
         # Mostrar plot interativo
         try:
@@ -577,15 +875,31 @@ class WindowsKvaserMonitor:
     def stop(self):
         """Para o monitor"""
         self.running = False
+        if self._notifier:
+            self._notifier.stop()
+            self._notifier = None
         if hasattr(self, 'bus'):
             self.bus.shutdown()
         
-        # Fechar arquivo CSV
+        # Esvaziar a fila de escrita e fechar arquivo CSV
+        if self._csv_thread:
+            csv_queue = self._csv_queue
+            if csv_queue:
+                try:
+                    csv_queue.put(_CSV_STOP, timeout=5.0)
+                except queue.Full:
+                    pass
+            self._csv_thread.join(timeout=5.0)
+            self._csv_thread = None
+            if self._csv_dropped:
+                print(f"✗ {self._csv_dropped} linhas do CSV descartadas (gravação atrasada)")
+        
         if self.csv_file:
             try:
                 self.csv_file.flush()
                 self.csv_file.close()
                 print(f"✓ Arquivo CSV fechado: {self.csv_output}")
+                self.csv_file = None
             except Exception as e:
                 print(f"Erro ao fechar CSV: {e}")
 
@@ -629,6 +943,7 @@ Exemplos de uso:
   python monitor_windows_kvaser.py --channel 1       # Canal 1 com Kvaser  
   python monitor_windows_kvaser.py --simulate        # Modo simulação
   python monitor_windows_kvaser.py --csv dados.csv   # Com logging CSV
+  python monitor_windows_kvaser.py --speed-range 0 6000  # Eixo Y fixo
         """
     )
     parser.add_argument('--channel', type=int, default=0, 
@@ -639,6 +954,12 @@ Exemplos de uso:
                        help='Tamanho do buffer de dados')
     parser.add_argument('--csv', type=str, default=None,
                        help='Arquivo CSV para salvar dados')
+    parser.add_argument('--speed-range', type=float, nargs=2, default=None,
+                       metavar=('MIN', 'MAX'),
+                       help='Faixa fixa do eixo de velocidade (rpm) - padrão: autoescala')
+    parser.add_argument('--torque-range', type=float, nargs=2, default=None,
+                       metavar=('MIN', 'MAX'),
+                       help='Faixa fixa do eixo de torque (N/m) - padrão: autoescala')
     
     args = parser.parse_args()
     
@@ -658,6 +979,10 @@ Exemplos de uso:
     print(f"Buffer: {args.buffer} amostras")
     if args.csv:
         print(f"Salvando em CSV: {args.csv}")
+    if args.speed_range:
+        print(f"Faixa de velocidade: {args.speed_range[0]:.0f} a {args.speed_range[1]:.0f} rpm")
+    if args.torque_range:
+        print(f"Faixa de torque: {args.torque_range[0]:.1f} a {args.torque_range[1]:.1f} N/m")
     print("=" * 70)
     print("\nIDs CAN monitorados:")
     print("  • Setpoint Velocidade Compartilhado: 0x18FFF3FE")
@@ -668,13 +993,17 @@ Exemplos de uso:
     monitor = WindowsKvaserMonitor(
         channel=args.channel,
         buffer_size=args.buffer,
-        csv_output=args.csv
+        csv_output=args.csv,
+        speed_range=args.speed_range,
+        torque_range=args.torque_range
     )
     
     try:
         monitor.run(simulation_mode=args.simulate)
     except KeyboardInterrupt:
         print("\n\nEncerrando...")
+    finally:
+        # Garante que as linhas pendentes do CSV sejam gravadas
         monitor.stop()
     
     print("\n✓ Monitor finalizado")
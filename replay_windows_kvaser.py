@@ -11,10 +11,83 @@ Uso no Windows:
 import can
 import time
 import sys
+import re
 import argparse
+from itertools import repeat
 from pathlib import Path
 import struct
+import ctypes
+import gc
+import threading
+import traceback
+import queue
+import mmap
+import os
 
+import numpy as np
+
+# Numba é opcional: sem ele o parser do log usa regex + indexação vetorizada do NumPy
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Abaixo desta folga (ns) a espera vira busy-spin, a resolução do sleep não basta
+_SPIN_THRESHOLD_NS = 2_000_000
+
+# Blocos do log lidos pela thread de parse e lotes em espera na fila de envio
+_PARSE_CHUNK_SIZE = 1 << 16
+_QUEUE_BATCHES = 16
+
+# Cache do log já parseado, no diretório <log>.cache: um <campo>.bin bruto por
+# campo (lido com np.memmap) e meta.npy com (mensagens, ignoradas, tamanho e
+# mtime_ns do log); o cache só vale se tamanho e mtime_ns baterem com o log
+_BATCH_FIELDS = ('timestamps', 'ids', 'data', 'dlc', 'extended')
+_CACHE_LAYOUT = {
+    'timestamps': (np.float64, ()),
+    'ids': (np.uint32, ()),
+    'data': (np.uint8, (8,)),
+    'dlc': (np.uint8, ()),
+    'extended': (np.bool_, ()),
+}
+_CACHE_META = 'meta.npy'
+_CACHE_BATCH = 4096
+
+# Intervalo (s) entre atualizações da linha de progresso do replay (4 Hz) e
+# largura fixa da linha, para o \r não deixar restos de um texto mais longo
+_PROGRESS_INTERVAL = 0.25
+_PROGRESS_WIDTH = 60
+
+# Tabela de 65536 entradas: par de caracteres ASCII hex (hi<<8 | lo) -> byte
+_HEX_LUT = np.full(65536, 0xFFFF, dtype=np.uint16)
+for _hi in b'0123456789abcdefABCDEF':
+    for _lo in b'0123456789abcdefABCDEF':
+        _HEX_LUT[(_hi << 8) | _lo] = int(bytes((_hi, _lo)), 16)
+del _hi, _lo
+
+# Linha de exemplo que força a compilação do parser @njit; bytes somente leitura,
+# como a view do mmap, para o numba gerar a mesma especialização
+_WARMUP_LINE = b'(0.000000) can0 18FFA120#0BB8000013370000\n'
+
+# Payload vazio compartilhado por parse_candump_line
+_EMPTY = b''
+
+# Maior identificador CAN válido (29 bits, quadro estendido)
+_MAX_CAN_ID = 0x1FFFFFFF
+
+# Linha candump: (timestamp) interface canid#dados (dados em pares hex, no
+# máximo 8 bytes; id com até 8 dígitos). O último grupo só casa com linhas inválidas, para contá-las
+_CANDUMP_RE = re.compile(
+    rb'^[ \t]*(?:\((\d+(?:\.\d*)?)\)[ \t]+\S+[ \t]+([0-9A-Fa-f]{1,8})#((?:[0-9A-Fa-f]{2}){0,8})(?=\s|$)'
+    rb'|([^#\s]))',
+    re.MULTILINE)
 
 def parse_candump_line(line):
     """
@@ -26,101 +99,606 @@ def parse_candump_line(line):
     if not line or line.startswith('#'):
         return None
     
+    # partition() em vez de index()/split('#'): sem listas intermediárias e sem
+    # exceção quando o separador falta
+    timestamp_str, sep, rest = line.partition(')')
+    if not sep:
+        print(f"Erro ao parsear linha: {line} - timestamp sem ')'", file=sys.stderr)
+        return None
+    
+    # Separa interface e mensagem
+    parts = rest.split()
+    if len(parts) < 2:
+        return None
+    
+    # Parse da mensagem CAN (formato: ID#DATA)
+    can_id_str, sep, data_str = parts[1].partition('#')
+    if not sep:
+        return None
+    
+    # Conversões: try sem exceção não custa nada no CPython 3.11+, só linhas
+    # inválidas (raras) pagam pelo raise
     try:
-        # Extrai timestamp
-        timestamp_end = line.index(')')
-        timestamp_str = line[1:timestamp_end]
-        timestamp = float(timestamp_str)
-        
-        # Extrai o resto da linha após o timestamp
-        rest = line[timestamp_end + 1:].strip()
-        
-        # Separa interface e mensagem
-        parts = rest.split()
-        if len(parts) < 2:
-            return None
-        
-        # Parse da mensagem CAN (formato: ID#DATA)
-        can_msg = parts[1]
-        if '#' not in can_msg:
-            return None
-        
-        can_id_str, data_str = can_msg.split('#', 1)
-        
-        # Converte ID (pode ser hexadecimal)
-        can_id = int(can_id_str, 16)
-        
-        # Converte dados de hex para bytes
-        data = bytes.fromhex(data_str) if data_str else b''
-        
         return {
-            'timestamp': timestamp,
-            'arbitration_id': can_id,
-            'data': data
+            'timestamp': float(timestamp_str[1:]),
+            'arbitration_id': int(can_id_str, 16),
+            'is_extended_id': len(can_id_str) > 3,
+            'data': bytes.fromhex(data_str) if data_str else _EMPTY
         }
-    except (ValueError, IndexError) as e:
+    except ValueError as e:
         print(f"Erro ao parsear linha: {line} - {e}", file=sys.stderr)
         return None
 
 
-def replay_can_log_kvaser(log_file, channel=0, speed_factor=1.0, loop=False, can_interface='can'):
+@njit(cache=True)
+def hex_decode(buf, out):
+    """Decodifica pares de caracteres hex (uint8) em bytes, um lookup por byte"""
+    for i in range(len(buf) // 2):
+        out[i] = _HEX_LUT[(np.uint16(buf[2 * i]) << 8) | buf[2 * i + 1]]
+
+
+@njit(cache=True)
+def _hex_nibble(c):
+    """Valor de um caractere hex ASCII, ou -1 se não for hex"""
+    # Faixas do byte original: dobrar a caixa antes (c | 0x20) levaria os bytes
+    # de controle 0x10-0x19 a '0'-'9'
+    v = np.int64(c)
+    if 48 <= v <= 57:
+        return v - 48
+    if 65 <= v <= 70:
+        return v - 55
+    if 97 <= v <= 102:
+        return v - 87
+    return -1
+
+
+@njit(cache=True)
+def _is_space(c):
+    return c == 32 or 9 <= c <= 13
+
+
+@njit(cache=True)
+def parse_line_nb(buf, pos, end, out):
+    """
+    Parse de uma linha candump em buf[pos:end], escrevendo o payload em out
+    
+    Retorna (status, timestamp, can_id, dlc, extended); status 1 = válida,
+    0 = vazia/comentário, -1 = formato inválido. Como no candump, IDs com
+    mais de 3 dígitos hex são estendidos (29 bits)
+    """
+    while pos < end and (buf[pos] == 32 or buf[pos] == 9):
+        pos += 1
+    if pos == end or buf[pos] == 35 or _is_space(buf[pos]):
+        return 0, 0.0, 0, 0, False
+    
+    # (timestamp): dígitos acumulados num inteiro e uma única divisão no fim,
+    # o mesmo arredondamento de float() enquanto couber em 2**53
+    if buf[pos] != 40:
+        return -1, 0.0, 0, 0, False
+    pos += 1
+    mantissa = 0
+    n_digits = 0
+    while pos < end and 48 <= buf[pos] <= 57:
+        mantissa = mantissa * 10 + (np.int64(buf[pos]) - 48)
+        n_digits += 1
+        pos += 1
+    if n_digits == 0:
+        return -1, 0.0, 0, 0, False
+    scale = 1.0
+    if pos < end and buf[pos] == 46:
+        pos += 1
+        while pos < end and 48 <= buf[pos] <= 57:
+            mantissa = mantissa * 10 + (np.int64(buf[pos]) - 48)
+            scale *= 10.0
+            pos += 1
+    if pos == end or buf[pos] != 41:
+        return -1, 0.0, 0, 0, False
+    timestamp = mantissa / scale
+    pos += 1
+    
+    # Espaços, interface, espaços
+    start = pos
+    while pos < end and (buf[pos] == 32 or buf[pos] == 9):
+        pos += 1
+    if pos == start:
+        return -1, 0.0, 0, 0, False
+    start = pos
+    while pos < end and not _is_space(buf[pos]):
+        pos += 1
+    if pos == start:
+        return -1, 0.0, 0, 0, False
+    start = pos
+    while pos < end and (buf[pos] == 32 or buf[pos] == 9):
+        pos += 1
+    if pos == start:
+        return -1, 0.0, 0, 0, False
+    
+    # canid#
+    can_id = 0
+    start = pos
+    while pos < end:
+        v = _hex_nibble(buf[pos])
+        if v < 0:
+            break
+        can_id = (can_id << 4) | v
+        pos += 1
+    if pos == start or pos == end or buf[pos] != 35:
+        return -1, 0.0, 0, 0, False
+    # Mesmo limite da regex: até 8 dígitos e 29 bits
+    if pos - start > 8 or can_id > _MAX_CAN_ID:
+        return -1, 0.0, 0, 0, False
+    extended = pos - start > 3
+    pos += 1
+    
+    # Dados: até 16 caracteres hex em pares, seguidos de espaço ou fim de linha
+    start = pos
+    while pos < end and _hex_nibble(buf[pos]) >= 0:
+        pos += 1
+    n_chars = pos - start
+    if n_chars % 2 or n_chars > 16 or (pos < end and not _is_space(buf[pos])):
+        return -1, 0.0, 0, 0, False
+    dlc = n_chars // 2
+    hex_decode(buf[start:pos], out)
+    out[dlc:] = 0
+    return 1, timestamp, can_id, dlc, extended
+
+
+@njit(cache=True, nogil=True)
+def _parse_candump_nb(buf, starts, ends, timestamps, ids, data, dlc, extended):
+    """Parse de cada linha buf[starts[i]:ends[i]]; retorna (mensagens, linhas inválidas)"""
+    n = 0
+    ignored = 0
+    for i in range(len(starts)):
+        status, ts, can_id, n_bytes, is_ext = parse_line_nb(buf, starts[i], ends[i], data[n])
+        if status > 0:
+            timestamps[n] = ts
+            ids[n] = can_id
+            dlc[n] = n_bytes
+            extended[n] = is_ext
+            n += 1
+        elif status < 0:
+            ignored += 1
+    return n, ignored
+
+
+def _parse_candump_regex(buf):
+    """Caminho sem numba: uma regex compilada e decodificação hex vetorizada"""
+    matches = _CANDUMP_RE.findall(buf)
+    
+    ignored = sum(1 for m in matches if m[3])
+    if ignored:
+        matches = [m for m in matches if not m[3]]
+    
+    n = len(matches)
+    timestamps = np.fromiter(map(float, [m[0] for m in matches]), dtype=np.float64, count=n)
+    id_strs = [m[1] for m in matches]
+    ids = np.fromiter(map(int, id_strs, repeat(16, n)), dtype=np.uint32, count=n)
+    extended = np.fromiter(map(len, id_strs), dtype=np.uint8, count=n) > 3
+    
+    # 8 dígitos ainda passam de 29 bits: essas linhas também contam como ignoradas
+    valid = ids <= _MAX_CAN_ID
+    if not valid.all():
+        ignored += n - int(valid.sum())
+        matches = [m for m, ok in zip(matches, valid) if ok]
+        n = len(matches)
+        timestamps, ids, extended = timestamps[valid], ids[valid], extended[valid]
+    
+    # Payloads completados até 16 caracteres e decodificados num só buffer
+    payloads = [m[2] for m in matches]
+    dlc = np.fromiter(map(len, payloads), dtype=np.uint8, count=n) // 2
+    hex_buf = np.frombuffer(b''.join([p.ljust(16, b'0') for p in payloads]), dtype=np.uint8)
+    data = _HEX_LUT[hex_buf.view('>u2')].astype(np.uint8)
+    
+    return timestamps, ids, data.reshape(n, 8), dlc, extended, ignored
+
+
+def _parse_candump_range(mm, start, end):
+    """Parse das linhas em mm[start:end] (parser @njit se numba existir)"""
+    if _HAVE_NUMBA:
+        # View sem cópia sobre as páginas mapeadas; liberada também em caso de
+        # erro (inclusive nos frames do traceback, como os argumentos guardados
+        # pelo dispatcher do numba), senão o mm.close() do chamador falha com
+        # BufferError e esconde o erro original
+        raw = np.frombuffer(mm, dtype=np.uint8, count=end - start, offset=start)
+        try:
+            newlines = np.flatnonzero(raw == 10)
+            starts = np.concatenate(([0], newlines + 1))
+            ends = np.concatenate((newlines, [len(raw)]))
+            capacity = len(starts)
+            timestamps = np.empty(capacity, dtype=np.float64)
+            ids = np.empty(capacity, dtype=np.uint32)
+            data = np.empty((capacity, 8), dtype=np.uint8)
+            dlc = np.empty(capacity, dtype=np.uint8)
+            extended = np.empty(capacity, dtype=np.bool_)
+            n, ignored = _parse_candump_nb(raw, starts, ends, timestamps, ids, data, dlc, extended)
+        except BaseException as e:
+            traceback.clear_frames(e.__traceback__)
+            raise
+        finally:
+            del raw
+        return timestamps[:n], ids[:n], data[:n], dlc[:n], extended[:n], ignored
+    return _parse_candump_regex(mm[start:end])
+
+
+def _warm_up_jit():
+    """Compila (ou carrega do cache do numba) o parser antes de o replay começar"""
+    if _HAVE_NUMBA:
+        _parse_candump_range(_WARMUP_LINE, 0, len(_WARMUP_LINE))
+
+
+def _iter_line_chunks(mm, chunk_size):
+    """Divide mm em faixas (start, end) de ~chunk_size bytes terminadas em fim de linha"""
+    size = len(mm)
+    start = 0
+    while start < size:
+        end = min(start + chunk_size, size)
+        if end < size:
+            newline = mm.rfind(b'\n', start, end)
+            if newline < 0:
+                newline = mm.find(b'\n', end)
+            end = size if newline < 0 else newline + 1
+        yield start, end
+        start = end
+
+
+def _open_log(log_file):
+    """Mapeia o log em memória; None se o arquivo estiver vazio (mmap não aceita tamanho 0)"""
+    with open(log_file, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def parse_candump_bulk(log_file):
+    """
+    Lê um log candump inteiro de uma vez (parser @njit se numba existir)
+    
+    Retorna arrays paralelos (estrutura de arrays):
+        timestamps: np.ndarray float64
+        ids: np.ndarray uint32
+        data: np.ndarray uint8 (n, 8), completado com zeros
+        dlc: np.ndarray uint8 com o tamanho de cada payload
+        extended: np.ndarray bool, True para IDs de 29 bits
+    """
+    # Arquivo mapeado em memória: parse direto das páginas, sem cópia nem decodificação
+    mm = _open_log(log_file)
+    if mm is None:
+        return _parse_candump_regex(b'')[:5]
+    
+    try:
+        *arrays, ignored = _parse_candump_range(mm, 0, len(mm))
+    finally:
+        mm.close()
+    
+    if ignored:
+        print(f"⚠️  {ignored} linhas ignoradas: formato inválido")
+    
+    return tuple(arrays)
+
+
+def _put_until_stopped(q, item, stop_event):
+    """put() na fila cheia sem travar quando o replay é interrompido"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _iter_parsed_batches(mm):
+    """Lotes (timestamps, ids, data, dlc, extended, ignoradas) lidos do log em blocos"""
+    for start, end in _iter_line_chunks(mm, _PARSE_CHUNK_SIZE):
+        yield _parse_candump_range(mm, start, end)
+
+
+def _iter_cached_batches(cache):
+    """Lotes fatiados (sem cópia) dos arrays já parseados do cache"""
+    columns = [cache[key] for key in _BATCH_FIELDS]
+    ignored = int(cache['ignored'])
+    for start in range(0, len(columns[0]), _CACHE_BATCH):
+        batch = slice(start, start + _CACHE_BATCH)
+        yield (*(column[batch] for column in columns), ignored)
+        ignored = 0
+
+
+def _produce_batches(source, batches, stats, stop_event, writer=None):
+    """Thread de parse: entrega à fila de envio os lotes de source (e os grava no cache)"""
+    try:
+        for *batch, ignored in source:
+            stats['ignored'] += ignored
+            timestamps = batch[0]
+            if not len(timestamps):
+                continue
+            if stats['first'] is None:
+                stats['first'] = timestamps[0]
+            stats['last'] = timestamps[-1]
+            stats['n'] += len(timestamps)
+            if writer is not None:
+                writer.append(batch)
+            if not _put_until_stopped(batches, batch, stop_event):
+                return
+    except Exception as e:
+        stats['error'] = e
+    finally:
+        _put_until_stopped(batches, None, stop_event)
+
+
+def _cache_path(log_file):
+    return f"{log_file}.cache"
+
+
+def _load_log_cache(log_file):
+    """Arrays do cache do log mapeados do disco, ou None se faltar ou não for deste log"""
+    path = _cache_path(log_file)
+    try:
+        st = os.stat(log_file)
+        n, ignored, size, mtime_ns = np.load(os.path.join(path, _CACHE_META)).tolist()
+        if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+            return None
+        cache = {key: np.memmap(os.path.join(path, f"{key}.bin"), dtype=dtype, mode='r',
+                                shape=(n, *shape))
+                 for key, (dtype, shape) in _CACHE_LAYOUT.items()}
+    except (OSError, ValueError):
+        return None
+    cache['ignored'] = ignored
+    return cache
+
+
+class _LogCacheWriter:
+    """Grava o cache do log lote a lote, durante a primeira passada (memória limitada)"""
+    
+    def __init__(self, log_file):
+        self.path = _cache_path(log_file)
+        self._files = []
+        self._n = 0
+        try:
+            # Tamanho e mtime antes do parse: se o log mudar no meio, o cache não vale
+            st = os.stat(log_file)
+            self._stamp = (st.st_size, st.st_mtime_ns)
+            os.makedirs(self.path, exist_ok=True)
+            # Sem meta o cache antigo deixa de valer antes de ser sobrescrito
+            self._remove(_CACHE_META)
+            for key in _BATCH_FIELDS:
+                self._files.append(open(os.path.join(self.path, f"{key}.tmp"), 'wb'))
+        except OSError as e:
+            self._fail(e)
+    
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.path, name))
+        except FileNotFoundError:
+            pass
+    
+    def _fail(self, e):
+        print(f"⚠️  Não foi possível salvar o cache {self.path}: {e}")
+        self.discard()
+    
+    def append(self, batch):
+        if self._files is None:
+            return
+        try:
+            for f, column, key in zip(self._files, batch, _BATCH_FIELDS):
+                column.astype(_CACHE_LAYOUT[key][0], copy=False).tofile(f)
+            self._n += len(batch[0])
+        except OSError as e:
+            self._fail(e)
+    
+    def commit(self, ignored):
+        """Fecha os arquivos e grava o meta por último; True se o cache foi salvo"""
+        if self._files is None:
+            return False
+        try:
+            for f in self._files:
+                f.close()
+            self._files = None
+            for key in _BATCH_FIELDS:
+                os.replace(os.path.join(self.path, f"{key}.tmp"),
+                           os.path.join(self.path, f"{key}.bin"))
+            tmp_path = os.path.join(self.path, 'meta.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.array([self._n, ignored, *self._stamp], dtype=np.int64))
+            os.replace(tmp_path, os.path.join(self.path, _CACHE_META))
+        except OSError as e:
+            self._fail(e)
+            return False
+        print(f"💾 Cache salvo: {self.path}")
+        return True
+    
+    def discard(self):
+        """Descarta a gravação em andamento (replay interrompido ou com erro)"""
+        files, self._files = self._files, None
+        for f in files or ():
+            f.close()
+        for name in (*(f"{key}.tmp" for key in _BATCH_FIELDS), 'meta.tmp'):
+            try:
+                self._remove(name)
+            except OSError:
+                pass
+        # Diretório criado nesta passada e ainda vazio
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+
+def _raise_thread_priority():
+    """Eleva a prioridade da thread atual (TIME_CRITICAL no Windows, SCHED_FIFO no Linux)"""
+    # Com um único núcleo a thread em busy-spin deixaria sem CPU quem detém o GIL
+    if (os.cpu_count() or 1) < 2:
+        return
+    try:
+        if sys.platform == 'win32':
+            kernel32 = ctypes.WinDLL('kernel32')
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 15)
+        elif hasattr(os, 'sched_setscheduler'):
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+    except OSError:
+        # SCHED_FIFO exige privilégios; segue com a prioridade normal
+        pass
+
+
+def _get_until_stopped(q, stop_event):
+    """get() bloqueante que devolve None quando o replay é interrompido"""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+
+def _send_frames(bus, messages, batches, speed_factor, sent, stats, stop_event):
+    """
+    Loop de envio do replay, executado na thread dedicada
+    
+    Ao terminar, por qualquer motivo, sinaliza stop_event para a thread de parse
+    não ficar presa na fila cheia; uma exceção fica em stats['error']
+    """
+    try:
+        _send_batches(bus, messages, batches, speed_factor, sent, stop_event)
+    except Exception as e:
+        if stats['error'] is None:
+            stats['error'] = e
+    finally:
+        stop_event.set()
+
+
+def _send_batches(bus, messages, batches, speed_factor, sent, stop_event):
+    """Envia os lotes da fila nos instantes do log, até o sentinela None"""
+    _raise_thread_priority()
+    
+    # Sem coletas do GC durante o envio; o chamador já coletou antes de iniciar
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        scale_ns = 1e9 / speed_factor
+        first_ts = None
+        while True:
+            batch = _get_until_stopped(batches, stop_event)
+            if batch is None:
+                break
+            timestamps, ids, data, dlc, extended = batch
+            
+            # O relógio começa no primeiro lote: o envio não espera o parse do arquivo inteiro
+            if first_ts is None:
+                first_ts = timestamps[0]
+                start_ns = time.perf_counter_ns()
+            
+            # Instantes absolutos de envio do lote, em ns inteiros
+            deadlines = (start_ns + np.rint((timestamps - first_ts) * scale_ns).astype(np.int64)).tolist()
+            ids_list = ids.tolist()
+            dlc_list = dlc.tolist()
+            ext_list = extended.tolist()
+            payload = memoryview(data.reshape(-1))
+            
+            for i in range(len(deadlines)):
+                if stop_event.is_set():
+                    return
+                
+                # Aguarda até o momento correto: espera grossa (interrompível) e busy-spin no final
+                deadline = deadlines[i]
+                remaining = deadline - time.perf_counter_ns()
+                if remaining > _SPIN_THRESHOLD_NS and stop_event.wait((remaining - _SPIN_THRESHOLD_NS // 2) * 1e-9):
+                    return
+                while time.perf_counter_ns() < deadline:
+                    pass
+                
+                # Envia mensagem
+                try:
+                    n_bytes = dlc_list[i]
+                    msg = messages[ext_list[i]]
+                    msg.arbitration_id = ids_list[i]
+                    msg.dlc = n_bytes
+                    msg.data[:] = payload[i * 8:i * 8 + n_bytes]
+                    bus.send(msg)
+                    sent[0] += 1
+                except Exception as e:
+                    print(f"\n❌ Erro ao enviar mensagem {sent[0]}: {e}")
+                    continue
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def replay_can_log_kvaser(log_file, channel=0, speed_factor=1.0, loop=False, can_interface='can',
+                          bitrate=500000):
     """
     Reproduz mensagens CAN de um arquivo de log usando driver Kvaser
     
+    O log é lido em blocos por uma thread de parse enquanto outra envia, então
+    o replay começa logo. A primeira passada grava os lotes no diretório
+    <log>.cache (um .bin por campo e meta.npy); as execuções seguintes mapeiam
+    esses arquivos com np.memmap sem parsear o log, enquanto o tamanho e o
+    mtime_ns do log forem os guardados em meta.npy.
+    
     Args:
         log_file: Caminho para o arquivo .log do candump
         channel: Canal Kvaser (0, 1, 2, etc.)
         speed_factor: Fator de velocidade (1.0 = tempo real, 2.0 = 2x mais rápido)
         loop: Se True, repete o replay continuamente
         can_interface: Nome da interface CAN (can0, can1 para Kvaser)
+        bitrate: Taxa do barramento em bit/s
     """
     
-    # Carrega todas as mensagens do arquivo
-    messages = []
-    print(f"📁 Carregando arquivo: {log_file}")
+    print(f"📁 Abrindo arquivo: {log_file}")
+    _warm_up_jit()
     
-    try:
-        with open(log_file, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                msg_data = parse_candump_line(line)
-                if msg_data:
-                    messages.append(msg_data)
-                elif line.strip() and not line.startswith('#'):
-                    print(f"⚠️  Linha {line_num} ignorada: formato inválido")
-    except FileNotFoundError:
-        print(f"❌ Arquivo não encontrado: {log_file}")
-        return
-    except Exception as e:
-        print(f"❌ Erro ao ler arquivo: {e}")
-        return
-    
-    if not messages:
-        print(f"❌ Nenhuma mensagem válida encontrada em {log_file}")
-        return
+    # Log já parseado antes: os arrays vêm do cache, sem parse
+    mm = None
+    cache = _load_log_cache(log_file)
+    if cache is not None:
+        print(f"⚡ Usando cache: {_cache_path(log_file)} ({len(cache['timestamps'])} mensagens)")
+    else:
+        try:
+            mm = _open_log(log_file)
+        except FileNotFoundError:
+            print(f"❌ Arquivo não encontrado: {log_file}")
+            return
+        except Exception as e:
+            print(f"❌ Erro ao ler arquivo: {e}")
+            return
+        
+        if mm is None:
+            print(f"❌ Nenhuma mensagem válida encontrada em {log_file}")
+            return
     
-    print(f"✅ Carregadas {len(messages)} mensagens do log")
     print(f"🔧 Interface Kvaser Canal {channel} ({can_interface})")
     print(f"⚡ Fator de velocidade: {speed_factor}x")
     
-    # Calcula duração total do log
-    if len(messages) >= 2:
-        duration = messages[-1]['timestamp'] - messages[0]['timestamp']
-        print(f"⏱️  Duração do log: {duration:.1f} segundos")
-    
     # Cria conexão com o barramento CAN Kvaser
     interface_name = f"{can_interface}{channel}"
     
+    # Só transmite: um único handle CANlib, sem eco das próprias mensagens
     try:
-        bus = can.interface.Bus(channel=str(channel), interface='kvaser')
-        print(f"✅ Conectado ao Kvaser Canal {channel}")
+        bus = can.interface.Bus(channel=str(channel), interface='kvaser', bitrate=bitrate,
+                                single_handle=True, receive_own_messages=False)
+        print(f"✅ Conectado ao Kvaser Canal {channel} ({bitrate} bit/s)")
     except Exception as e:
         print(f"❌ Erro ao conectar com Kvaser Canal {channel}: {e}")
         print("💡 Verifique se:")
         print("   - Driver Kvaser está instalado")
         print("   - Hardware Kvaser está conectado")
         print("   - Canal especificado existe")
+        if mm is not None:
+            mm.close()
         return
     
+    # Duas mensagens reutilizadas em todos os envios (ID de 11 e de 29 bits); só ID,
+    # DLC e dados mudam
+    messages = (can.Message(arbitration_id=0, data=bytes(8), is_extended_id=False),
+                can.Message(arbitration_id=0, data=bytes(8), is_extended_id=True))
+    
+    # No Windows o timer do sistema tem ~15 ms de resolução; pede 1 ms durante o replay
+    winmm = ctypes.WinDLL('winmm') if sys.platform == 'win32' else None
+    if winmm:
+        winmm.timeBeginPeriod(1)
+    
+    # Um evento por iteração: o envio o sinaliza ao terminar, Ctrl+C também
+    stop_event = threading.Event()
+    parser = sender = writer = None
+    
     try:
         iteration = 0
         while True:
@@ -128,42 +706,67 @@ def replay_can_log_kvaser(log_file, channel=0, speed_factor=1.0, loop=False, can
             if loop:
                 print(f"\n🔄 === Iteração {iteration} ===")
             
-            # Timestamp de referência (primeira mensagem)
-            start_timestamp = messages[0]['timestamp']
-            start_time = time.time()
-            
             print(f"🚀 Iniciando replay...")
             
-            for i, msg_data in enumerate(messages):
-                # Calcula o delay relativo ao início
-                relative_delay = (msg_data['timestamp'] - start_timestamp) / speed_factor
-                target_time = start_time + relative_delay
-                
-                # Aguarda até o momento correto
-                current_time = time.time()
-                sleep_time = target_time - current_time
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                
-                # Envia mensagem
-                try:
-                    msg = can.Message(
-                        arbitration_id=msg_data['arbitration_id'],
-                        data=msg_data['data'],
-                        is_extended_id=True
-                    )
-                    bus.send(msg)
-                    
-                    # Mostra progresso
-                    if (i + 1) % 100 == 0 or i == len(messages) - 1:
-                        progress = (i + 1) / len(messages) * 100
-                        print(f"📊 Progresso: {i + 1}/{len(messages)} ({progress:.1f}%)", end='\r')
-                        
-                except Exception as e:
-                    print(f"\n❌ Erro ao enviar mensagem {i}: {e}")
-                    continue
+            # Parse e envio em threads ligadas por uma fila limitada; esta só mostra o progresso
+            batches = queue.Queue(maxsize=_QUEUE_BATCHES)
+            stats = {'n': 0, 'ignored': 0, 'first': None, 'last': None, 'error': None}
+            sent = [0]
+            stop_event = threading.Event()
+            # Só a primeira passada pelo log grava o cache
+            if cache is not None:
+                source, writer = _iter_cached_batches(cache), None
+            else:
+                source = _iter_parsed_batches(mm)
+                writer = _LogCacheWriter(log_file) if iteration == 1 else None
+            gc.collect()
+            parser = threading.Thread(target=_produce_batches,
+                                      args=(source, batches, stats, stop_event, writer),
+                                      daemon=True)
+            sender = threading.Thread(target=_send_frames,
+                                      args=(bus, messages, batches, speed_factor, sent, stats, stop_event),
+                                      daemon=True)
+            parser.start()
+            sender.start()
+            # Total conhecido desde o início com cache; lendo o log, só ao fim do parse
+            total = len(cache['timestamps']) if cache is not None else None
+            while True:
+                sender.join(_PROGRESS_INTERVAL)
+                done = sent[0]
+                if not parser.is_alive():
+                    total = stats['n']
+                if total is None:
+                    line = f"📊 Progresso: {done} mensagens enviadas"
+                else:
+                    line = f"📊 Progresso: {done}/{total} ({done / max(total, 1) * 100:.1f}%)"
+                sys.stdout.write(f"{line:<{_PROGRESS_WIDTH}}\r")
+                if not sender.is_alive():
+                    break
+            # A última atualização já traz o total final; só encerra a linha
+            print()
+            parser.join()
             
-            print(f"\n✅ Replay completo! {len(messages)} mensagens enviadas")
+            if stats['error'] is not None:
+                print(f"❌ Erro durante o replay: {stats['error']}")
+                break
+            
+            if iteration == 1 and stats['ignored']:
+                print(f"⚠️  {stats['ignored']} linhas ignoradas: formato inválido")
+            
+            n_messages = stats['n']
+            if not n_messages:
+                print(f"❌ Nenhuma mensagem válida encontrada em {log_file}")
+                break
+            
+            print(f"✅ Replay completo! {n_messages} mensagens enviadas")
+            if iteration == 1 and n_messages >= 2:
+                print(f"⏱️  Duração do log: {stats['last'] - stats['first']:.1f} segundos")
+            
+            # Primeira passada completa pelo log: as próximas iterações já usam o cache
+            if writer is not None:
+                if writer.commit(stats['ignored']):
+                    cache = _load_log_cache(log_file)
+                writer = None
             
             if not loop:
                 break
@@ -176,6 +779,17 @@ def replay_can_log_kvaser(log_file, channel=0, speed_factor=1.0, loop=False, can
     except Exception as e:
         print(f"\n❌ Erro durante o replay: {e}")
     finally:
+        stop_event.set()
+        for thread in (sender, parser):
+            if thread is not None:
+                thread.join()
+        # Passada interrompida ou com erro: cache incompleto não é salvo
+        if writer is not None:
+            writer.discard()
+        if mm is not None:
+            mm.close()
+        if winmm:
+            winmm.timeEndPeriod(1)
         bus.shutdown()
         print("🔌 Conexão CAN fechada")
 
@@ -234,11 +848,16 @@ IDs comuns nos exemplos:
                        help='Repetir replay continuamente')
     parser.add_argument('-i', '--interface', default='can',
                        help='Nome da interface CAN (can, can0, etc.) - padrão: can')
+    parser.add_argument('-b', '--bitrate', type=int, default=500000,
+                       help='Taxa do barramento em bit/s - padrão: 500000')
     parser.add_argument('--check-drivers', action='store_true',
                        help='Verificar instalação do driver Kvaser')
     
     args = parser.parse_args()
     
+    if args.speed <= 0:
+        parser.error('--speed deve ser maior que zero')
+    
     print("=" * 70)
     print("🔄 Replayer CAN Windows - Driver Kvaser")
     print("=" * 70)
@@ -264,6 +883,7 @@ IDs comuns nos exemplos:
     print(f"📁 Arquivo de log: {args.log_file}")
     print(f"🔧 Canal Kvaser: {args.channel}")
     print(f"⚡ Fator de velocidade: {args.speed}x")
+    print(f"📶 Bitrate: {args.bitrate} bit/s")
     print(f"🔁 Loop: {'Sim' if args.loop else 'Não'}")
     print("=" * 70)
     
@@ -273,7 +893,8 @@ IDs comuns nos exemplos:
         channel=args.channel,
         speed_factor=args.speed,
         loop=args.loop,
-        can_interface=args.interface
+        can_interface=args.interface,
+        bitrate=args.bitrate
     )
 
 
@@ -41,6 +41,30 @@ if errorlevel 1 (
 
 echo.
 
+REM Backend Qt para o gráfico (mais rápido que Tk; opcional)
+echo Instalando backend gráfico Qt (PyQt5)...
+pip install PyQt5
+
+if errorlevel 1 (
+    echo [AVISO] PyQt5 não instalado - o monitor usará o backend Tk
+) else (
+    echo [OK] PyQt5 instalado
+)
+
+echo.
+
+REM JIT do parser do replay e da simulação (opcional)
+echo Instalando compilador JIT (numba)...
+pip install numba
+
+if errorlevel 1 (
+    echo [AVISO] numba não instalado - replay e simulação usarão o caminho em Python
+) else (
+    echo [OK] numba instalado
+)
+
+echo.
+
 REM Verificar driver Kvaser
 echo Verificando driver Kvaser...
 python -c "import can.interface.kvaser; print('[OK] Driver Kvaser disponível')" 2>nul